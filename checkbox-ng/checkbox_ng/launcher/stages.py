@@ -269,9 +269,14 @@ class MainLoopStage(CheckboxUiStage):
             self.sa.use_job_result(job_id, result_builder.get_result())
 
     def _generate_job_infos(self, job_list):
-        test_info_list = tuple()
+        test_info_list = []
+        cat_names = dict()
+        get_job_state = self.sa.get_job_state
         for job in job_list:
-            cat_id = self.sa.get_job_state(job.id).effective_category_id
+            job_state = get_job_state(job.id)
+            cat_id = job_state.effective_category_id
+            if cat_id not in cat_names:
+                cat_names[cat_id] = self.sa.get_category(cat_id).tr_name()
             duration_txt = _('No estimated duration provided for this job')
             if job.estimated_duration is not None:
                 duration_txt = '{} {}'.format(job.estimated_duration, _(
@@ -281,7 +286,7 @@ class MainLoopStage(CheckboxUiStage):
                 "partial_id": job.partial_id,
                 "name": job.tr_summary(),
                 "category_id": cat_id,
-                "category_name": self.sa.get_category(cat_id).tr_name(),
+                "category_name": cat_names[cat_id],
                 "automated": (
                     _('this job is fully automated')
                     if job.automated
@@ -290,10 +295,10 @@ class MainLoopStage(CheckboxUiStage):
                 "duration": duration_txt,
                 "description": (job.tr_description() or
                                 _('No description provided for this job')),
-                "outcome": self.sa.get_job_state(job.id).result.outcome,
+                "outcome": job_state.result.outcome,
             }
-            test_info_list = test_info_list + ((test_info, ))
-        return test_info_list
+            test_info_list.append(test_info)
+        return tuple(test_info_list)
 
     def _generate_tp_infos(self, tp_list):
         tp_info_list = []
@@ -32,9 +32,25 @@ import urwid
 from plainbox.abc import IJobResult
 
 
-_widget_cache = {}
+_flagged_ids = set()
+# Main loop of the running browser, used to debounce the selection toggles
+_main_loop = None
+_pending_toggle = None
+_pending_toggle_alarm = None
+# Delay (in seconds) before propagating a toggled state to the tree
+TOGGLE_DELAY = 0.05
 test_info_list = ()
 show_job_ids = False
+# Per-field columns and lookup tables built once from test_info_list
+# (see index_test_info())
+_job_ids = []
+_job_partial_ids = []
+_job_names = []
+_job_category_ids = []
+_job_outcomes = []
+_job_index = {}
+_jobs_by_category = {}
+_category_names = {}
 
 
 class ASCIIScreen(urwid.raw_display.Screen):
@@ -58,6 +74,12 @@ else:
 
 
 class FlagUnitWidget(urwid.TreeWidget):
+    # urwid widgets have an instance __dict__, slots keep the attributes
+    # below out of it
+    __slots__ = (
+        '_flagged', '_children_state', '_loaded_children', '_indent_cols',
+        '_flagged_children', '_columns_widget', '_shown_flagged',
+        '_uniform_descendants')
     # apply an attribute to the expand/unexpand icons
     unexpanded_icon = urwid.AttrMap(
         urwid.TreeWidget.unexpanded_icon, 'dirmark')
@@ -65,38 +87,86 @@ class FlagUnitWidget(urwid.TreeWidget):
         urwid.TreeWidget.expanded_icon, 'dirmark')
     selected = urwid.Text(u'[X]')
     unselected = urwid.Text(u'[ ]')
+    # indexed by the flagged state
+    check_boxes = (unselected, selected)
+    # the spacer only holds blanks, it can be shared by all the widgets
+    spacer = urwid.Text(u' ')
 
     def __init__(self, node):
-        self.flagged = True
+        # widgets are loaded lazily, when first displayed: they start with
+        # the state their parent last propagated to its descendants
+        parent = node.get_parent()
+        if parent is None:
+            self._flagged = True
+        else:
+            parent_w = parent.get_widget()
+            self._flagged = parent_w._children_state
+            parent_w._loaded_children[node.get_key()] = self
+        node.flagged = self._flagged
+        self._children_state = self._flagged
+        # True while all the descendants are in the _children_state state
+        self._uniform_descendants = True
+        self._loaded_children = {}
+        # the depth of a node never changes, neither does its indentation
+        depth = node.get_depth()
+        if depth > 1:
+            self._indent_cols = self.indent_cols * (depth - 1)
+        else:
+            self._indent_cols = 1
         super().__init__(node)
+        # number of flagged children, including the ones not loaded yet.
+        # It is kept up to date by the children themselves.
+        self._flagged_children = 0
+        if self._flagged and not self.is_leaf:
+            self._flagged_children = len(node.get_child_keys())
+        # keep a reference to the columns, their cells are updated in place
+        self._columns_widget = self._w
         # insert an extra AttrWrap for our own use
-        self._w = urwid.AttrWrap(self._w, None)
+        self._w = urwid.AttrWrap(self._w, 'body', 'focus')
         self.update_w()
 
+    @property
+    def flagged(self):
+        return self._flagged
+
+    @flagged.setter
+    def flagged(self, new_state):
+        if new_state == self._flagged:
+            return
+        self._flagged = new_state
+        node = self.get_node()
+        node.flagged = new_state
+        parent = node.get_parent()
+        if parent is not None:
+            parent.get_widget()._flagged_children += 1 if new_state else -1
+        # the check box is only updated when the widget is next rendered
+        self._invalidate()
+
+    def render(self, size, focus=False):
+        if self._shown_flagged != self._flagged:
+            self.update_w()
+        return super().render(size, focus)
+
     def selectable(self):
         return True
 
     def get_indent_cols(self):
-        depth = self.get_node().get_depth()
-        if depth > 1:
-            return self.indent_cols * (self.get_node().get_depth() - 1)
-        else:
-            return 1
+        return self._indent_cols
 
     def get_indented_widget(self):
-        indent_cols = self.get_indent_cols()
+        indent_cols = self._indent_cols
         widget = self.get_inner_widget()
         if self.is_leaf:
             widget = urwid.Columns(
-                [(3, [self.selected, self.unselected][self.flagged]),
+                [(3, self.check_boxes[self.flagged]),
                  urwid.Padding(widget,
                                width=('relative', 100),
                                left=indent_cols)],
                 dividechars=1)
         else:
             widget = urwid.Columns(
-                [(3, [self.selected, self.unselected][self.flagged]),
-                 (indent_cols-1, urwid.Text(' ')),
+                [(3, self.check_boxes[self.flagged]),
+                 (indent_cols-1, self.spacer),
                  (1, [self.unexpanded_icon,
                       self.expanded_icon][self.expanded]),
                  urwid.Padding(widget, width=('relative', 100))],
@@ -106,7 +176,7 @@ class FlagUnitWidget(urwid.TreeWidget):
     def update_expanded_icon(self):
         """Update display widget text for parent widgets"""
         # icon is second element in columns indented widget
-        self._w.base_widget.widget_list[2] = [
+        self._columns_widget.widget_list[2] = [
             self.unexpanded_icon, self.expanded_icon][self.expanded]
 
     def keypress(self, size, key):
@@ -120,7 +190,7 @@ class FlagUnitWidget(urwid.TreeWidget):
             return False
         expand_col = 4
         if self.get_node().get_depth() > 1:
-            expand_col = self.get_indent_cols() + 4
+            expand_col = self._indent_cols + 4
         if not self.is_leaf and row == 0 and col == expand_col:
             self.expanded = not self.expanded
             self.update_expanded_icon()
@@ -131,22 +201,35 @@ class FlagUnitWidget(urwid.TreeWidget):
         return False
 
     def unhandled_keys(self, size, key):
-        global show_job_ids, _widget_cache
+        global show_job_ids
         if key == " ":
+            if _pending_toggle is not self:
+                apply_pending_toggle()
             self.flagged = not self.flagged
-            self.set_descendants_state(self.flagged)
-            self.set_ancestors_state(self.flagged)
             self.update_w()
-        elif not self.is_leaf and key == "enter":
+            # the descendants of the ancestors are no longer uniform
+            parent = self.get_node().get_parent()
+            while parent is not None:
+                parent.get_widget()._uniform_descendants = False
+                parent = parent.get_parent()
+            # Propagating the state to the rest of the tree is delayed, so
+            # that repeated presses only walk the tree once
+            if _main_loop is None:
+                self.set_descendants_state(self.flagged)
+                self.set_ancestors_state(self.flagged)
+            else:
+                defer_toggle(self)
+            return
+        apply_pending_toggle()
+        if not self.is_leaf and key == "enter":
             self.expanded = not self.expanded
             self.update_expanded_icon()
         elif key in ('i', 'I'):
             show_job_ids = not show_job_ids
-            for w in _widget_cache.values():
-                w._w.base_widget.widget_list[-1] = urwid.Padding(
-                    w.load_inner_widget(),
-                    width=('relative', 100),
-                    left=w.get_indent_cols())
+            # Job widgets refresh their text when rendered. Dropping the
+            # cached canvases is enough to get the ones on screen redrawn,
+            # the others will be rendered when they are scrolled into view.
+            urwid.CanvasCache.clear()
         elif key in ('s', 'S'):
             root_node_widget = self.get_node().get_root().get_widget()
             root_node_widget.flagged = True
@@ -164,52 +247,86 @@ class FlagUnitWidget(urwid.TreeWidget):
         """Set the selection state of all ancestors consistently."""
         parent = self.get_node().get_parent()
         # If child is set, then all ancestors must be set
+        # (and once an ancestor is set, so are all of its own ancestors)
         if self.flagged:
-            while parent:
-                parent_w = parent.get_widget()
-                parent_w.flagged = new_state
-                parent_w.update_w()
+            while parent and not parent.flagged:
+                parent.get_widget().flagged = new_state
                 parent = parent.get_parent()
         # If child is not set, then all ancestors mustn't be set
         # unless another child of the ancestor is set
         else:
             while parent:
-                if any((parent.get_child_node(key).get_widget().flagged
-                        for key in parent.get_child_keys())):
-                    break
                 parent_w = parent.get_widget()
+                if parent_w._flagged_children:
+                    break
                 parent_w.flagged = new_state
-                parent_w.update_w()
                 parent = parent.get_parent()
 
     def set_descendants_state(self, new_state):
-        """Set the selection state of all descendants recursively."""
-        if self.is_leaf:
-            return
-        node = self.get_node()
-        for key in node.get_child_keys():
-            child_w = node.get_child_node(key).get_widget()
-            child_w.flagged = new_state
-            try:
-                child_w.update_w()
-            except AttributeError:
-                break
-            child_w.set_descendants_state(new_state)
+        """Set the selection state of all descendants."""
+        if new_state:
+            update_flagged_ids = _flagged_ids.update
+        else:
+            update_flagged_ids = _flagged_ids.difference_update
+        # walk the loaded widgets with an explicit stack, not recursion
+        stack = [self]
+        while stack:
+            widget = stack.pop()
+            # skip the subtrees already in the requested state
+            if widget.is_leaf or (widget._uniform_descendants and
+                                  widget._children_state == new_state):
+                continue
+            # children loaded later on will pick up the new state
+            widget._children_state = new_state
+            widget._uniform_descendants = True
+            node = widget.get_node()
+            get_child_node = node.get_child_node
+            loaded_children = widget._loaded_children
+            child_keys = node.get_child_keys()
+            for key in child_keys:
+                child_w = loaded_children.get(key)
+                if child_w is None:
+                    update_flagged_ids(get_child_node(key).get_leaf_keys())
+                    continue
+                child_w.flagged = new_state
+                stack.append(child_w)
+            widget._flagged_children = len(child_keys) if new_state else 0
 
     def update_w(self):
-        """Update the attributes of self.widget based on self.flagged."""
-        self._w.attr = 'body'
-        self._w.focus_attr = 'focus'
-        self._w.base_widget.widget_list[0] = [
-            self.unselected, self.selected][self.flagged]
+        """Update the check box of self.widget based on self.flagged."""
+        self._columns_widget.widget_list[0] = self.check_boxes[self.flagged]
+        self._shown_flagged = self.flagged
 
 
 class JobTreeWidget(FlagUnitWidget):
     """Widget for individual files."""
+    __slots__ = ('_show_job_id',)
 
     def __init__(self, node):
+        self._show_job_id = show_job_ids
         super().__init__(node)
-        add_widget(node.get_key(), self)
+
+    @FlagUnitWidget.flagged.setter
+    def flagged(self, new_state):
+        FlagUnitWidget.flagged.fset(self, new_state)
+        if new_state:
+            _flagged_ids.add(self.get_node().get_key())
+        else:
+            _flagged_ids.discard(self.get_node().get_key())
+
+    def rows(self, size, focus=False):
+        self.update_display_text()
+        return super().rows(size, focus)
+
+    def render(self, size, focus=False):
+        self.update_display_text()
+        return super().render(size, focus)
+
+    def update_display_text(self):
+        """Update the displayed text if show_job_ids has been toggled."""
+        if self._show_job_id != show_job_ids:
+            self._show_job_id = show_job_ids
+            self.get_inner_widget().set_text(self.get_display_text())
 
     def get_display_text(self):
         global show_job_ids
@@ -221,48 +338,71 @@ class JobTreeWidget(FlagUnitWidget):
 
 class CategoryWidget(FlagUnitWidget):
     """Widget for a category."""
+    # whether the categories below the root start collapsed
+    collapse_categories = True
 
     def __init__(self, node):
         super().__init__(node)
-        self.expanded = False
-        if node.get_depth() == 0:
-            self.expanded = True
-        self.update_expanded_icon()
+        # urwid builds the widget expanded, only update the icon if needed
+        if self.collapse_categories and node.get_depth() != 0:
+            self.expanded = False
+            self.update_expanded_icon()
 
     def get_display_text(self):
         node = self.get_node()
         if node.get_depth() == 0:
             return _("Categories")
         else:
-            cat_names = dict()
-            for test in test_info_list:
-                cat_names[test["category_id"]] = test["category_name"]
-            return cat_names[node.get_key()]
+            return _category_names[node.get_key()]
 
 
 class JobNode(urwid.TreeNode):
     """Metadata storage for individual jobs"""
+    # selection state, mirrored from the widget once it is loaded
+    flagged = None
 
     def load_widget(self):
         return JobTreeWidget(self)
 
+    def get_leaf_keys(self):
+        return [self.get_key()]
+
 
 class CategoryNode(urwid.ParentNode):
     """Metadata storage for categories"""
+    # selection state, mirrored from the widget once it is loaded
+    flagged = None
+
+    def __init__(self, value, parent=None, key=None, depth=None):
+        super().__init__(value, parent=parent, key=key, depth=depth)
+        self._child_positions = None
+
+    def get_child_index(self, key):
+        # urwid caches the sorted child keys but may look each key up in
+        # that list when moving to a sibling: index them once instead
+        if self._child_positions is None:
+            self._child_positions = {
+                child_key: index
+                for index, child_key in enumerate(self.get_child_keys())}
+        try:
+            return self._child_positions[key]
+        except KeyError:
+            return super().get_child_index(key)
 
     def load_widget(self):
         return CategoryWidget(self)
 
+    def get_leaf_keys(self):
+        """Return the keys of all the jobs below this node."""
+        if self.get_depth() == 0:
+            return _job_ids
+        return self.get_child_keys()
+
     def load_child_keys(self):
         if self.get_depth() == 0:
-            cat_names = dict()
-            for test in test_info_list:
-                cat_names[test["category_id"]] = test["category_name"]
-            return sorted(cat_names.keys(), key=lambda x: cat_names[x])
+            return sorted(_category_names, key=_category_names.get)
         else:
-            return sorted([
-                job['id'] for job in test_info_list
-                if job['category_id'] == self.get_key()])
+            return sorted(_jobs_by_category.get(self.get_key(), []))
 
     def load_child_node(self, key):
         """Return either a CategoryNode or JobNode"""
@@ -270,9 +410,8 @@ class CategoryNode(urwid.ParentNode):
             return CategoryNode(self.get_value(), parent=self,
                                 key=key, depth=self.get_depth() + 1)
         else:
-            value = next(
-                (job['partial_id'], job['name']) for job in test_info_list
-                if job["id"] == key)
+            index = _job_index[key]
+            value = (_job_partial_ids[index], _job_names[index])
             return JobNode(
                 value, parent=self, key=key, depth=self.get_depth() + 1)
 
@@ -350,12 +489,10 @@ class CategoryBrowser:
         urwid.Text("Exit (abandon session)   Ctrl+C")]))
 
     def __init__(self, title, tests):
-        global test_info_list
-        test_info_list = tests
+        index_test_info(tests)
         self.header = urwid.Padding(urwid.Text(title), left=1)
-        root_node = CategoryNode(tests)
-        root_node.get_widget().set_descendants_state(True)
-        self.listbox = CategoryListBox(CategoryWalker(root_node))
+        self.root_node = CategoryNode(tests)
+        self.listbox = CategoryListBox(CategoryWalker(self.root_node))
         self.listbox.offset_rows = 1
         self.footer = urwid.Columns(
             [urwid.Padding(urwid.Text(self.footer_text), left=1),
@@ -374,15 +511,20 @@ class CategoryBrowser:
         self.loop = urwid.MainLoop(
             self.view, self.palette, unhandled_input=self.unhandled_input,
             handle_mouse=False, screen=Screen())
-        self.loop.run()
-        selection = []
-        global test_info_list, _widget_cache
-        for w in _widget_cache.values():
-            if w.flagged:
-                selection.append(w.get_node().get_key())
-        _widget_cache = {}
-        test_info_list = ()
-        return frozenset(selection)
+        global _main_loop, _pending_toggle, _pending_toggle_alarm
+        _main_loop = self.loop
+        try:
+            self.loop.run()
+            apply_pending_toggle()
+        finally:
+            # never leave a toggle pending on a loop that is gone, e.g. when
+            # the session is interrupted with Ctrl+C
+            _pending_toggle = None
+            _pending_toggle_alarm = None
+            _main_loop = None
+        selection = frozenset(_flagged_ids)
+        index_test_info(())
+        return selection
 
     def unhandled_input(self, key):
         if self.loop.widget == self.view:
@@ -402,11 +544,7 @@ class CategoryBrowser:
                 self.loop.widget = self.view
 
     def _job_detail_view(self, node):
-        job = None
-        for test_info in test_info_list:
-            if test_info["id"] == node.get_key():
-                job = test_info
-                break
+        job = test_info_list[_job_index[node.get_key()]]
         contents = [urwid.Text(('focus', ' Job Details '), 'center'),
                     urwid.Divider()]
 
@@ -434,13 +572,7 @@ class RerunWidget(CategoryWidget):
         IJobResult.OUTCOME_CRASH: _("Crashed Jobs"),
         IJobResult.OUTCOME_NOT_SUPPORTED: _("Jobs with failed dependencies"),
     }
-
-    def __init__(self, node):
-        super().__init__(node)
-        self.expanded = True
-        if node.get_depth() == 0:
-            self.expanded = True
-        self.update_expanded_icon()
+    collapse_categories = False
 
     def get_display_text(self):
         node = self.get_node()
@@ -458,17 +590,30 @@ class RerunNode(CategoryNode):
     def load_widget(self):
         return RerunWidget(self)
 
+    def get_leaf_keys(self):
+        """Return the keys of all the jobs below this node."""
+        if self.get_depth() == 1:
+            keys = []
+            for key in self.get_child_keys():
+                keys.extend(self.get_child_node(key).get_leaf_keys())
+            return keys
+        return super().get_leaf_keys()
+
     def load_child_keys(self):
         if self.get_depth() == 0:
-            return sorted(set([job['outcome'] for job in test_info_list]))
+            return sorted(set(_job_outcomes))
         if self.get_depth() == 1:
-            return sorted(set([job['category_name'] for job in test_info_list
-                               if job['outcome'] == self.get_value()]))
+            return sorted(set([
+                _category_names[cat_id] for cat_id, outcome
+                in zip(_job_category_ids, _job_outcomes)
+                if outcome == self.get_value()]))
         else:
+            outcome = self.get_parent().get_key()
             return sorted([
-                job['id'] for job in test_info_list
-                if job['category_name'] == self.get_key() and
-                job['outcome'] == self.get_parent().get_key()])
+                job_id for job_id, cat_id, job_outcome
+                in zip(_job_ids, _job_category_ids, _job_outcomes)
+                if _category_names[cat_id] == self.get_key() and
+                job_outcome == outcome])
 
     def load_child_node(self, key):
         """Return either a CategoryNode or JobNode"""
@@ -477,9 +622,8 @@ class RerunNode(CategoryNode):
         if self.get_depth() == 1:
             return RerunNode(key, parent=self, key=key, depth=2)
         else:
-            value = next(
-                (job['partial_id'], job['name']) for job in test_info_list
-                if job["id"] == key)
+            index = _job_index[key]
+            value = (_job_partial_ids[index], _job_names[index])
             return JobNode(
                 value, parent=self, key=key, depth=self.get_depth() + 1)
 
@@ -489,8 +633,7 @@ class ReRunBrowser(CategoryBrowser):
                    ('start', 'F'), (') to Finish')]
 
     def __init__(self, title, tests, rerun_candidates):
-        global test_info_list
-        test_info_list = tests
+        index_test_info(tests)
         self.header = urwid.Padding(urwid.Text(title), left=1)
         self.root_node = RerunNode(tests)
         root_node_widget = self.root_node.get_widget()
@@ -929,6 +1072,50 @@ def resume_dialog(duration):
     loop.run()
 
 
-def add_widget(id, widget):
-    """Add the widget for a given id."""
-    _widget_cache[id] = widget
+def defer_toggle(widget):
+    """(Re)schedule the propagation of the state of a toggled widget."""
+    global _pending_toggle, _pending_toggle_alarm
+    if _pending_toggle_alarm is not None:
+        _main_loop.remove_alarm(_pending_toggle_alarm)
+    _pending_toggle = widget
+    _pending_toggle_alarm = _main_loop.set_alarm_in(
+        TOGGLE_DELAY, apply_pending_toggle)
+
+
+def apply_pending_toggle(loop=None, user_data=None):
+    """Propagate the state of the last toggled widget, if not done yet."""
+    global _pending_toggle, _pending_toggle_alarm
+    widget = _pending_toggle
+    if widget is None:
+        return
+    if _pending_toggle_alarm is not None and loop is None:
+        _main_loop.remove_alarm(_pending_toggle_alarm)
+    _pending_toggle = None
+    _pending_toggle_alarm = None
+    widget.set_descendants_state(widget.flagged)
+    widget.set_ancestors_state(widget.flagged)
+
+
+def index_test_info(tests):
+    """Set test_info_list and rebuild the columns derived from it."""
+    global test_info_list, _job_index, _jobs_by_category, _category_names
+    global _job_ids, _job_partial_ids, _job_names, _job_category_ids
+    global _job_outcomes, _flagged_ids
+    global _pending_toggle, _pending_toggle_alarm
+    test_info_list = tests
+    # a pending toggle belongs to the widgets of the previous browser
+    _pending_toggle = None
+    _pending_toggle_alarm = None
+    _job_ids = [test["id"] for test in tests]
+    _job_partial_ids = [test["partial_id"] for test in tests]
+    _job_names = [test["name"] for test in tests]
+    _job_category_ids = [test["category_id"] for test in tests]
+    _job_outcomes = [test.get("outcome") for test in tests]
+    _job_index = {job_id: index for index, job_id in enumerate(_job_ids)}
+    # every job starts selected
+    _flagged_ids = set(_job_ids)
+    _jobs_by_category = {}
+    for job_id, cat_id in zip(_job_ids, _job_category_ids):
+        _jobs_by_category.setdefault(cat_id, []).append(job_id)
+    _category_names = {
+        test["category_id"]: test["category_name"] for test in tests}